@@ -6,7 +6,7 @@ import sys
 from absl import flags
 
 from . import backtrace, flow, format, testing, utils
-from .basis import _dummy
+from .basis import FrameID, _dummy
 from .computation import computation_manager, Computation
 
 FLAGS = flags.FLAGS
@@ -29,43 +29,229 @@ flags.DEFINE_string(
 )
 
 
-def global_tracer(frame, event_type, arg):
-    """Global trace function."""
-    if utils.should_exclude(frame.f_code.co_filename):
+# Trace callbacks fire for every event, so even attribute lookups add up.
+# Binds the hot callables once instead of looking them up per event.
+_should_exclude = utils.should_exclude
+_add_computation = computation_manager.add_computation
+
+# ids of code objects already classified as excluded/traced. The filename never
+# changes for a given code object, so classifying per code object skips both the
+# co_filename fetch and the path matching on repeat events; set membership is
+# the cheapest test we can make per event. Seeded lazily on each code object's
+# first event and cleared in register() so stale ids from garbage-collected
+# code objects don't accumulate across runs.
+_excluded_code_ids = set()
+_traced_code_ids = set()
+
+# Per-event debug output. Gated behind __debug__ so the whole branch is elided
+# at compile time under -O, keeping the hot path free of the check.
+_DEBUG_TRACE = False
+
+
+def _code_excluded(code):
+    """Returns whether events from the code object should be excluded, with caching."""
+    code_id = id(code)
+    if code_id in _excluded_code_ids:
+        return True
+    if code_id in _traced_code_ids:
+        return False
+    excluded = _should_exclude(code.co_filename)
+    (_excluded_code_ids if excluded else _traced_code_ids).add(code_id)
+    return excluded
+
+
+# Events local_tracer should record, dispatched by a single pre-hashed dict
+# lookup instead of an if/elif chain on event_type.
+_LOCAL_DISPATCH = {"line": _add_computation, "return": _add_computation}
+
+
+def _mute_frame(frame):
+    """Tells CPython to stop sending events for an excluded frame.
+
+    Without this, returning None from a trace function doesn't prevent future
+    line events for a frame whose f_trace is already set, so excluded frames
+    would keep invoking us once per line.
+    """
+    frame.f_trace = None
+    frame.f_trace_lines = False
+
+
+def tracer(
+    frame,
+    event_type,
+    arg,
+    _excluded=_code_excluded,
+    _add=_add_computation,
+    _dispatch_get=_LOCAL_DISPATCH.get,
+    _call="call",
+):
+    """Trace function handling both global (call) and local (line/return) events.
+
+    Keeping one callable for both roles saves CPython a return-plus-call per
+    frame entered: the function simply returns itself to become the frame's
+    local trace function. Hot globals are bound as default arguments so lookups
+    inside the body hit local slots instead of LOAD_GLOBAL.
+    """
+    code = frame.f_code
+    if _excluded(code):
+        _mute_frame(frame)
         return
-    # print("\nglobal: ", frame, event_type, frame.f_code.co_filename, frame.f_lineno)
+    if __debug__ and _DEBUG_TRACE:
+        print("\ntrace: ", frame, event_type, code.co_filename, frame.f_lineno)
+
+    # The frame reference is dropped as soon as we return, so there's no need
+    # for an explicit `del frame` to break cycles here (see
+    # https://docs.python.org/3/library/inspect.html#the-interpreter-stack —
+    # that advice applies to long-lived references, not trace callbacks).
+    # Comparing against the pre-bound constant lets CPython short-circuit on
+    # identity: the interpreter passes the same interned "call" string for
+    # every call event, so the == never falls through to a character compare.
+    if event_type == _call:
+        if _add(event_type, frame, arg):
+            return tracer
+        # The call won't be recorded (e.g. a list comprehension frame or the
+        # register() call itself), so return None: CPython then never fires
+        # line or return events for this frame, keeping unrecorded children
+        # off the tracer.
+        return None
+
+    handler = _dispatch_get(event_type)
+    if handler is not None:
+        handler(event_type, frame, arg)
+
 
-    assert event_type == "call"
-    succeeded = computation_manager.add_computation(event_type, frame, arg)
+# Kept as aliases: the two roles used to be separate functions and external
+# code may still reference them by name.
+global_tracer = tracer
+local_tracer = tracer
 
-    # https://docs.python.org/3/library/inspect.html#the-interpreter-stack
-    del frame
-    if succeeded:
-        return local_tracer
 
+# ids of frames whose call event pushed a FrameID level. Unlike settrace,
+# sys.setprofile delivers a return event for every frame no matter what the
+# call handler did, so returns must only pop when the matching call actually
+# pushed — a comprehension/genexp frame's call is rejected before
+# FrameID.create("call") runs, and popping for it would drop the caller's
+# level and misattribute everything that follows.
+_pushed_frame_ids = set()
 
-def local_tracer(frame, event_type, arg):
-    """Local trace function."""
-    if utils.should_exclude(frame.f_code.co_filename):
+
+def profile_tracer(frame, event_type, arg):
+    """Profile function that only receives call/return events.
+
+    Used when line-level data is not needed, because sys.setprofile doesn't trigger
+    a callback per executed line, which makes it much cheaper than sys.settrace.
+    """
+    if _code_excluded(frame.f_code):
         return
-    # print("\nlocal: ", frame, event_type, frame.f_code.co_filename, frame.f_lineno)
+    if event_type == "call":
+        # Whether the call pushed a level is observable from the frame id
+        # stack's depth: Call.create may bail out before or after pushing,
+        # independently of whether a computation was recorded.
+        depth = len(FrameID.current_)
+        _add_computation(event_type, frame, arg)
+        if len(FrameID.current_) != depth:
+            _pushed_frame_ids.add(id(frame))
+    elif event_type == "return":
+        if id(frame) in _pushed_frame_ids:
+            _pushed_frame_ids.discard(id(frame))
+            # Keeps frame id bookkeeping in sync without recording a
+            # computation, since there's no line computation to attach the
+            # return value to.
+            FrameID.create(event_type)
+
+
+# sys.monitoring (PEP 669) lets us subscribe to exactly the events we need and
+# turn events off per code object, so excluded code costs nothing after it's
+# classified once. Only exists on 3.12+; older versions use settrace/setprofile.
+_USE_MONITORING = sys.version_info >= (3, 12)
+_MONITORING_TOOL_ID = 2  # sys.monitoring.PROFILER_ID
+_monitoring_active = False
+
+
+# ids of frames whose call event was recorded. sys.monitoring has no per-frame
+# off switch equivalent to settrace returning None from a call event, and
+# DISABLE is per code location, which would also silence other (recorded)
+# frames of the same code. So line and return callbacks check membership to
+# keep rejected frames — comprehensions, genexps, the register() call itself —
+# from reaching add_computation, matching the settrace path, which never
+# installs a local trace function for them.
+_recorded_frame_ids = set()
+
+
+def _monitor_start(code, instruction_offset):
+    if _code_excluded(code):
+        # Stops all future events for this code object.
+        sys.monitoring.set_local_events(_MONITORING_TOOL_ID, code, 0)
+        return sys.monitoring.DISABLE
+    frame = sys._getframe(1)
+    if _add_computation("call", frame, None):
+        _recorded_frame_ids.add(id(frame))
 
-    if event_type in {"line", "return"}:
-        computation_manager.add_computation(event_type, frame, arg)
 
-    del frame
+def _monitor_line(code, line_number):
+    if _code_excluded(code):
+        return sys.monitoring.DISABLE
+    frame = sys._getframe(1)
+    if id(frame) in _recorded_frame_ids:
+        _add_computation("line", frame, None)
+
+
+def _monitor_return(code, instruction_offset, retvalue):
+    if _code_excluded(code):
+        return sys.monitoring.DISABLE
+    frame = sys._getframe(1)
+    if id(frame) in _recorded_frame_ids:
+        _recorded_frame_ids.discard(id(frame))
+        _add_computation("return", frame, retvalue)
+
+
+def _init_monitoring():
+    """Registers monitoring callbacks equivalent to the settrace path."""
+    global _monitoring_active
+    _monitoring_active = True
+    monitoring = sys.monitoring
+    events = monitoring.events
+    monitoring.use_tool_id(_MONITORING_TOOL_ID, "cyberbrain")
+    monitoring.register_callback(_MONITORING_TOOL_ID, events.PY_START, _monitor_start)
+    monitoring.register_callback(_MONITORING_TOOL_ID, events.LINE, _monitor_line)
+    monitoring.register_callback(_MONITORING_TOOL_ID, events.PY_RETURN, _monitor_return)
+    monitoring.set_events(
+        _MONITORING_TOOL_ID, events.PY_START | events.LINE | events.PY_RETURN
+    )
+
+
+def _stop_monitoring():
+    global _monitoring_active
+    _monitoring_active = False
+    monitoring = sys.monitoring
+    monitoring.set_events(_MONITORING_TOOL_ID, 0)
+    monitoring.free_tool_id(_MONITORING_TOOL_ID)
 
 
 global_frame = None
 
 
-def init():
-    """Initializes tracing."""
+def init(line_events=True):
+    """Initializes tracing.
+
+    When line_events is False, only call/return events are recorded, through
+    sys.setprofile. This skips the per-line callback entirely and is much faster,
+    but register() won't be able to trace a target variable.
+    """
     global global_frame
 
     global_frame = sys._getframe(1)
-    sys.settrace(global_tracer)
-    global_frame.f_trace = local_tracer
+    if _USE_MONITORING and line_events:
+        # The frame init was called from never gets a PY_START while we're
+        # tracing; mark it recorded so its line events are kept, the same way
+        # the settrace branch sets global_frame.f_trace.
+        _recorded_frame_ids.add(id(global_frame))
+        _init_monitoring()
+    elif line_events:
+        sys.settrace(tracer)
+        global_frame.f_trace = tracer
+    else:
+        sys.setprofile(profile_tracer)
 
 
 def register(target=_dummy):
@@ -74,8 +260,17 @@ def register(target=_dummy):
     If target is not given, it is only called to terminate tracing and dump data.
     """
     FLAGS(sys.argv)  # See https://github.com/chris-chris/pysc2-examples/issues/5.
+    if _monitoring_active:
+        _stop_monitoring()
     sys.settrace(None)
+    sys.setprofile(None)
     global_frame.f_trace = None
+    # id() values can be reused once code objects are collected, so the caches
+    # are only trustworthy while tracing is active.
+    _excluded_code_ids.clear()
+    _traced_code_ids.clear()
+    _pushed_frame_ids.clear()
+    _recorded_frame_ids.clear()
     if target is _dummy:
         return
 
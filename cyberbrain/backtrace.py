@@ -1,6 +1,5 @@
 """Backtraces var change from target to program start."""
 
-from . import utils
 from .flow import Flow, Node, VarSwitch
 
 
@@ -12,20 +11,28 @@ def trace_flow(flow: Flow):
     current: Node
     next: Node
     current, next = flow.target.prev, flow.target
+    # Hoisted: the sentinel never changes, no reason to re-read it per step.
+    root = flow.ROOT
+
+    while current is not root:
+        # Which case applies depends on the (current, next) pair, not on the
+        # node alone — a callsite is visited once coming back from its callee
+        # and once from its own frame — so the dispatch can't be precomputed
+        # per node; step_into is resolved once per iteration instead.
+        step_into = current.step_into
 
-    while current is not flow.ROOT:
         # Case 1: non-callsite
-        if not current.is_callsite:
+        if step_into is None:
             current.sync_tracking_with(next)
             if any(current.get_and_update_var_changes(next)):
                 # If any change happened, track all ids appeared in this node.
-                current.add_tracking(*utils.find_names(current.code_ast))
+                current.add_tracking(*current.get_names())
             next, current = current, current.prev
             continue
 
         # Case 2: current is a callsite, next is the first line within the called
         # function.
-        if current.step_into is next:
+        if step_into is next:
             for identifier in next.tracking:
                 for arg_id in current.param_to_arg[identifier]:
                     current.add_tracking(arg_id)
@@ -43,15 +50,21 @@ def trace_flow(flow: Flow):
         current.sync_tracking_with(next)
         args = current.get_args()
         # ids on the left, like 'a', 'b' in 'a, b = f()'
-        ids_assigned_to = utils.find_names(current.code_ast) - args
+        ids_assigned_to = current.get_names() - args
         returned_from = current.returned_from
+        # Tracking the return statement's names is idempotent, so do it once
+        # after the loop instead of re-unpacking the set per matching change.
+        # No early break: later var changes may still hit the args branch.
+        track_returned_names = False
         for var_change in current.get_and_update_var_changes(next):
             if var_change.id in args:
                 returned_from.add_tracking(current.arg_to_param[var_change.id])
             elif var_change.id in ids_assigned_to:
                 # The return statement contributes to relevant changes.
                 returned_from.is_relevant_return = True
-                returned_from.add_tracking(*utils.find_names(returned_from.code_ast))
+                track_returned_names = True
+        if track_returned_names:
+            returned_from.add_tracking(*returned_from.get_names())
         returned_from.update_var_changes_before_return()
 
         next, current = returned_from, returned_from.prev
@@ -1,6 +1,7 @@
 """Some basic data structures used throughout the project."""
 
-from collections import defaultdict
+import itertools
+from array import array
 from enum import Enum
 from typing import Dict, NamedTuple, Tuple, Union
 
@@ -65,20 +66,57 @@ class FrameID:
 
     current_ = (0,)
 
-    # Mapping from parent frame id to max child frame index.
-    child_index: Dict[Tuple, int] = defaultdict(int)
+    # Max child frame index per parent frame, indexed by the parent's interned
+    # id. child_index is touched once per call and once per return in the
+    # traced program; an array indexed by dense int replaces hashing the frame
+    # id tuple on every one of those events.
+    child_index = array("i")
+
+    # Interns each distinct frame id tuple to a dense integer. FrameIDs are
+    # dict keys everywhere, and hashing/comparing variable-length tuples costs
+    # O(depth) per lookup; the dense id makes both single-word operations.
+    _intern: Dict[Tuple, int] = {}
+    _next_id = itertools.count()
+
+    @classmethod
+    def _index_of(cls, frame_id_tuple: Tuple[int, ...]) -> int:
+        """Returns the interned id of a frame id tuple, growing child_index."""
+        idx = cls._intern.setdefault(frame_id_tuple, next(cls._next_id))
+        if idx >= len(cls.child_index):
+            cls.child_index.extend([0] * (idx + 1 - len(cls.child_index)))
+        return idx
+
+    # Flyweight: one FrameID instance per distinct frame id tuple. Event
+    # handlers construct a FrameID per traced event, so returning the shared
+    # instance turns that into a dict hit, and per-frame metadata (co_name,
+    # the cached parent) is stamped once per frame rather than once per event.
+    _instances: Dict[Tuple, "FrameID"] = {}
+
+    def __new__(cls, frame_id_tuple: Tuple[int, ...], co_name: str = ""):
+        instance = cls._instances.get(frame_id_tuple)
+        if instance is None:
+            instance = super().__new__(cls)
+            instance._frame_id_tuple = frame_id_tuple
+            instance._id = cls._intern.setdefault(frame_id_tuple, next(cls._next_id))
+            instance._parent = None  # Built on first access, then reused.
+            instance.co_name = co_name
+            cls._instances[frame_id_tuple] = instance
+        return instance
 
     def __init__(self, frame_id_tuple: Tuple[int, ...], co_name: str = ""):
-        self._frame_id_tuple = frame_id_tuple
-        self.co_name = co_name
+        # State lives on the shared instance set up in __new__; only an
+        # explicitly passed co_name updates it. A frame id maps to exactly one
+        # code object, so the stamp is idempotent.
+        if co_name:
+            self.co_name = co_name
 
     def __eq__(self, other: Union["FrameID", Tuple[int, ...]]):
         if isinstance(other, FrameID):
-            return self._frame_id_tuple == other._frame_id_tuple
+            return self._id == other._id
         return isinstance(other, Tuple) and self._frame_id_tuple == other
 
     def __hash__(self):
-        return hash(self._frame_id_tuple)
+        return self._id
 
     def __add__(self, other: Tuple):
         return FrameID(self._frame_id_tuple + other)
@@ -93,7 +131,11 @@ class FrameID:
 
     @property
     def parent(self):
-        return FrameID(self._frame_id_tuple[:-1])
+        # Caches the parent so repeated access doesn't slice a new tuple and
+        # allocate a new FrameID every time.
+        if self._parent is None and self._frame_id_tuple:
+            self._parent = FrameID(self._frame_id_tuple[:-1])
+        return self._parent
 
     def is_child_of(self, other):
         return other == self._frame_id_tuple
@@ -108,13 +150,13 @@ class FrameID:
             return cls.current()
         if event == "call":
             frame_id = cls.current()
-            cls.current_ = cls.current_ + (cls.child_index[cls.current_],)
+            cls.current_ = cls.current_ + (cls.child_index[cls._index_of(cls.current_)],)
             return frame_id  # callsite is in caller frame.
         if event == "return":
             call_frame = cls.current()
             cls.current_ = cls.current_[:-1]
             # After exiting call frame, increments call frame's child index.
-            cls.child_index[cls.current_] += 1
+            cls.child_index[cls._index_of(cls.current_)] += 1
             return call_frame
 
     def __str__(self):
@@ -127,4 +169,18 @@ class ID(str):
 
     There's no need to save frame info, because at a ceratain time, a computation or
     node only sees one value for one identifier, and we can omit others.
+
+    Instances are interned: the same identifier string always yields the same
+    ID object. Identifiers are set elements and dict keys all over tracing, and
+    CPython's dict/set lookup takes a pointer-equality fast path when keys are
+    the same object, skipping character comparison.
     """
+
+    _instances: Dict[str, "ID"] = {}
+
+    def __new__(cls, string: str):
+        instance = cls._instances.get(string)
+        if instance is None:
+            instance = super().__new__(cls, string)
+            cls._instances[string] = instance
+        return instance
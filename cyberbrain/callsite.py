@@ -3,13 +3,28 @@
 import ast
 import inspect
 import itertools
-from collections import namedtuple
 from typing import Dict, Iterable, Set, Tuple
 
 from . import utils
 from .basis import ID
 
-Args = namedtuple("Args", ["args", "kwargs"])
+# Maps id(args tuple) -> tuple of ID-wrapped parameter names, self excluded.
+# get_argvalues hands out one shared, never-freed args tuple per code object,
+# so the IDs for a callee's parameters only need to be built once instead of
+# once per traced call. Lists (e.g. from inspect.getargvalues) aren't shared,
+# so they take the uncached path.
+_param_ids_cache: Dict[int, Tuple[ID, ...]] = {}
+
+
+def _param_ids(args) -> Tuple[ID, ...]:
+    if type(args) is tuple:
+        ids = _param_ids_cache.get(id(args))
+        if ids is None:
+            ids = _param_ids_cache[id(args)] = tuple(
+                ID(param) for param in args if param != "self"
+            )
+        return ids
+    return tuple(ID(param) for param in args if param != "self")
 
 
 def get_param_arg_pairs(
@@ -30,27 +45,49 @@ def get_param_arg_pairs(
     Name(id='c', ctx=Load()), baz
     Name(id='d', ctx=Load()), args
     keyword(arg='qux', value=Name(id='e', ctx=Load())), kwargs
+
+    Parameters are yielded as pre-interned IDs so downstream consumers don't
+    re-wrap the same names on every call.
     """
     _ARGS = arg_info.varargs  # extra arguments' name, could be anything.
     _KWARGS = arg_info.keywords  # extra kw-arguments' name, could be anything.
 
     pos_args = callsite_ast.args
     kw_args = callsite_ast.keywords
+
+    # Fast path for the overwhelmingly common signature without *args/**kwargs:
+    # parameters don't need expanding, so pair them up without building a list.
+    # self is excluded since it's not explicitly passed from caller.
+    if _ARGS is None and _KWARGS is None:
+        yield from zip(itertools.chain(pos_args, kw_args), _param_ids(arg_info.args))
+        return
+
     # Builds a parameter list that expands *args and **kwargs to their length, so that
     # we can emit a 1-to-1 pair of (arg, param).
-    # Excludes self since it's not explicitly passed from caller.
-    parameters = [arg for arg in arg_info.args if arg != "self"]
-
-    # There could be no *args or *kwargs in signature.
+    parameters = list(_param_ids(arg_info.args))
     if _ARGS is not None:
-        parameters += [_ARGS] * len(arg_info.locals[_ARGS])
+        parameters += [ID(_ARGS)] * len(arg_info.locals[_ARGS])
     if _KWARGS is not None:
-        parameters += [_KWARGS] * len(arg_info.locals[_KWARGS])
+        parameters += [ID(_KWARGS)] * len(arg_info.locals[_KWARGS])
 
     for arg, param in zip(itertools.chain(pos_args, kw_args), parameters):
         yield arg, param
 
 
+# Maps id(arg AST node) -> (arg, names found in it). The same call site feeds
+# the same argument nodes to find_names on every traced call; caching makes the
+# subtree walk run once per distinct argument expression. The entry keeps a
+# strong reference to the node so its id can't be recycled by a later tree.
+_arg_names_cache: Dict[int, Tuple[ast.AST, Set[ID]]] = {}
+
+
+def _find_arg_names(arg: ast.AST) -> Set[ID]:
+    entry = _arg_names_cache.get(id(arg))
+    if entry is None:
+        entry = _arg_names_cache[id(arg)] = (arg, utils.find_names(arg))
+    return entry[1]
+
+
 def get_param_to_arg(
     callsite_ast: ast.Call, arg_info: inspect.ArgInfo
 ) -> Dict[ID, Set[ID]]:
@@ -72,6 +109,6 @@ def get_param_to_arg(
     In the future, we *might* record fine grained info.
     """
     return {
-        ID(param): utils.find_names(arg)
+        param: _find_arg_names(arg)
         for arg, param in get_param_arg_pairs(callsite_ast, arg_info)
     }
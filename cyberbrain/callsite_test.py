@@ -2,12 +2,16 @@
 
 import ast
 import inspect
+from functools import lru_cache
 
 from . import callsite
 from .basis import ID
 
 
-def _get_call(module_ast: ast.Module) -> ast.Call:
+@lru_cache(maxsize=None)
+def _parse_call(code: str) -> ast.Call:
+    """Parses code into its call expression, cached across assertions."""
+    module_ast = ast.parse(code)
     assert isinstance(
         module_ast.body[0], ast.Expr
     ), "Passed in code is not a call expression."
@@ -20,7 +24,7 @@ def test_get_param_to_arg():
         return inspect.getargvalues(inspect.currentframe())
 
     # Tests passing values directly.
-    assert callsite.get_param_to_arg(_get_call(ast.parse("f(1,2)")), f(1, 2)) == {
+    assert callsite.get_param_to_arg(_parse_call("f(1,2)"), f(1, 2)) == {
         ID("foo"): set(),
         ID("bar"): set(),
     }
@@ -28,13 +32,13 @@ def test_get_param_to_arg():
     # Tests passing variables.
     a, b, c = 1, 2, 3
     assert callsite.get_param_to_arg(
-        _get_call(ast.parse("f(a,b,c)")), f(a, b, z=c)
+        _parse_call("f(a,b,c)"), f(a, b, z=c)
     ) == {ID("foo"): {ID("a")}, ID("bar"): {ID("b")}, ID("baz"): {ID("c")}}
 
     # Tests catching extra args.
     d, e = 4, 5
     assert callsite.get_param_to_arg(
-        _get_call(ast.parse("f(a,b,c,d,qux=e)")), f(a, b, c, d, qux=e)
+        _parse_call("f(a,b,c,d,qux=e)"), f(a, b, c, d, qux=e)
     ) == {
         ID("foo"): {ID("a")},
         ID("bar"): {ID("b")},
@@ -45,7 +49,7 @@ def test_get_param_to_arg():
 
     # Tests binding multiple params to one argument.
     assert callsite.get_param_to_arg(
-        _get_call(ast.parse("f(a,(b,c),c,qux=(d, e))")), f(a, (b, c), c, qux=(d, e))
+        _parse_call("f(a,(b,c),c,qux=(d, e))"), f(a, (b, c), c, qux=(d, e))
     ) == {
         ID("foo"): {ID("a")},
         ID("bar"): {ID("b"), ID("c")},
@@ -58,14 +62,14 @@ def test_get_param_to_arg():
         return inspect.getargvalues(inspect.currentframe())
 
     assert callsite.get_param_to_arg(
-        _get_call(ast.parse("g(d,qux=e)")), g(d, qux=e)
+        _parse_call("g(d,qux=e)"), g(d, qux=e)
     ) == {ID("foo"): {ID("d")}, ID("bar"): {ID("e")}}
 
     # Tests signature without args or kwargs.
     def h(x):
         return inspect.getargvalues(inspect.currentframe())
 
-    assert callsite.get_param_to_arg(_get_call(ast.parse("h(a)")), h(a)) == {
+    assert callsite.get_param_to_arg(_parse_call("h(a)"), h(a)) == {
         ID("x"): {ID("a")}
     }
 
@@ -91,5 +95,5 @@ def test_get_param_to_arg_from_method():
     # Tests implicit self is ignored.
     arg_values = MyClass(1, y=2).arg_values
     assert callsite.get_param_to_arg(
-        _get_call(ast.parse("MyClass(1, y=2)")), arg_values
+        _parse_call("MyClass(1, y=2)"), arg_values
     ) == {ID("x"): set(), ID("y"): set()}
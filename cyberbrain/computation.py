@@ -1,23 +1,116 @@
 """Vars structures for recording program execution."""
 
-import abc
 import ast
 import inspect
-from collections import defaultdict
+import os
+import sys
+from collections import defaultdict, deque
+from functools import lru_cache
 from pathlib import PurePath
-from typing import Dict, List, Union
+from types import CodeType
+from typing import Deque, Dict, Tuple, Union
 
 import black
 import executing
-from pympler import asizeof
 
 from . import utils
 from .basis import FrameID, SourceLocation, Surrounding
 from .vars import Vars
 
 
-class Computation(metaclass=abc.ABCMeta):
-    """Base class to represent a computation unit of the program."""
+# Maps code object -> interned co_filename. Each code object's filename is
+# stored once; every computation from it then shares the same string object, so
+# equality checks degrade to pointer compares and no per-event copy is kept.
+# Keyed by the code object itself, not id(code): the key keeps the code object
+# alive, so a collected code object can't have its id recycled into serving
+# another code's cached entry. Code hashing is as cheap as id for this use.
+_interned_filenames: Dict[CodeType, str] = {}
+
+
+def _intern_filename(code):
+    filename = _interned_filenames.get(code)
+    if filename is None:
+        filename = sys.intern(code.co_filename)
+        _interned_filenames[code] = filename
+    return filename
+
+
+# Maps (code, surrounding) -> SourceLocation. A hot loop revisits the same
+# logical line thousands of times; interning hands every one of those events
+# the same location object instead of a fresh namedtuple. Keyed by the code
+# object itself for the same id-recycling reason as _interned_filenames.
+_sourceloc_cache: Dict[Tuple[CodeType, Surrounding], SourceLocation] = {}
+
+
+def _intern_source_location(code, surrounding: Surrounding) -> SourceLocation:
+    key = (code, surrounding)
+    location = _sourceloc_cache.get(key)
+    if location is None:
+        location = _sourceloc_cache[key] = SourceLocation(
+            filepath=_intern_filename(code), surrounding=surrounding
+        )
+    return location
+
+
+# Maps (code, f_lasti) -> callsite AST node (or None for non-Call sites).
+# A callsite executed N times (e.g. a call in a loop) resolves to the same
+# bytecode position every time, so the executing-statement search only needs to
+# run once per position. Keyed by the code object itself for the same
+# id-recycling reason as _interned_filenames. Kept in memory only: AST nodes
+# carry references into the parsed source tree and aren't meaningfully
+# serializable to disk.
+_callsite_ast_cache: Dict[Tuple[CodeType, int], ast.AST] = {}
+
+
+def _is_register_call(callsite_ast: ast.Call) -> bool:
+    """Recognizes cyberbrain.register(...) from the AST.
+
+    Checked on every call event; reading the two attributes is much cheaper
+    than formatting the callsite to text and string-matching it.
+    """
+    func = callsite_ast.func
+    return (
+        isinstance(func, ast.Attribute)
+        and func.attr == "register"
+        and isinstance(func.value, ast.Name)
+        and func.value.id == "cyberbrain"
+    )
+
+
+def _get_callsite_ast(caller_frame):
+    key = (caller_frame.f_code, caller_frame.f_lasti)
+    try:
+        return _callsite_ast_cache[key]
+    except KeyError:
+        node = executing.Source.executing(caller_frame).node
+        _callsite_ast_cache[key] = node
+        return node
+
+
+@lru_cache(maxsize=None)
+def _basename(filepath: str) -> str:
+    """Basename of a filepath, cached: paths repeat across all computations
+    from a file, and PurePath re-parses the whole path each time."""
+    return PurePath(filepath).name
+
+
+# asizeof recursively walks the whole object graph of every Vars snapshot,
+# which dwarfs the rest of the per-event work; the size accumulator is opt-in.
+_TRACK_VARS_SIZE = os.environ.get("CYBERBRAIN_TRACK_VARS_SIZE") == "1"
+
+
+class Computation:
+    """Base class to represent a computation unit of the program.
+
+    A plain base class: with only Line and Call as subclasses and no code
+    instantiating the base, ABCMeta's isinstance/subclass machinery was pure
+    overhead.
+    """
+
+    # Subclasses enumerate their attributes in __slots__: one Line or Call is
+    # created per traced event, and dropping the per-instance __dict__ both
+    # shrinks each object severalfold and speeds up attribute access.
+    __slots__ = ()
 
     code_str: str
     event_type: str
@@ -26,14 +119,17 @@ class Computation(metaclass=abc.ABCMeta):
     vars_total_size = 0
 
     def __new__(cls, **kwargs):
-        """Automatically sums up the size of vars."""
+        """Automatically sums up the size of vars, if tracking is enabled."""
         assert cls.VARS_ATTR_NAME in kwargs
-        Computation.vars_total_size += asizeof.asizeof(kwargs[cls.VARS_ATTR_NAME])
+        if _TRACK_VARS_SIZE:
+            # Deferred import: pympler is only loaded when someone opts in.
+            from pympler import asizeof  # pylint: disable=import-outside-toplevel
+
+            Computation.vars_total_size += asizeof.asizeof(kwargs[cls.VARS_ATTR_NAME])
         return super().__new__(cls)
 
-    @abc.abstractmethod
     def to_dict(self):
-        """Serializes attrs to dict. Subclasses must override this method."""
+        """Serializes attrs to dict. Subclasses extend the returned dict."""
         surrounding = self.source_location.surrounding
         if surrounding.start_lineno == surrounding.end_lineno:
             lineno_str = surrounding.start_lineno
@@ -41,7 +137,7 @@ class Computation(metaclass=abc.ABCMeta):
             lineno_str = f"{surrounding.start_lineno} ~ {surrounding.end_lineno}"
         return {
             "event": self.event_type,
-            "filepath": PurePath(self.source_location.filepath).name,
+            "filepath": _basename(self.source_location.filepath),
             "lineno": lineno_str,
             "code_str": self.code_str,
         }
@@ -56,6 +152,23 @@ class Computation(metaclass=abc.ABCMeta):
 class Line(Computation):
     """Class that represents a logical line without entering into a new call."""
 
+    # The event type is fixed by the class, so it lives there rather than in
+    # a per-instance slot. return_value and vars_before_return are filled in
+    # later by the "return" branch of add_computation; hasattr still reports
+    # False until then.
+    event_type = "line"
+
+    __slots__ = (
+        "raw_code_str",
+        "_code_str",
+        "source_location",
+        "vars",
+        "frame_id",
+        "surrounding",
+        "vars_before_return",
+        "return_value",
+    )
+
     def __init__(
         self,
         *,
@@ -63,23 +176,31 @@ class Line(Computation):
         source_location: SourceLocation,
         vars: Vars,
         frame_id: FrameID,
-        event_type: str,
         surrounding: Surrounding,
     ):
-        self.code_str = code_str
-        try:
-            self.code_str = black.format_str(
-                self.code_str, mode=black.FileMode()
-            ).strip()
-        except black.InvalidInput:
-            pass
+        self.raw_code_str = code_str
+        self._code_str = None
         self.source_location = source_location
         self.vars = vars
-        self.event_type = event_type
         self.frame_id = frame_id
         self.surrounding = surrounding
         self.vars_before_return = None
 
+    @property
+    def code_str(self):
+        # Runs black lazily: formatting every executed line in the trace
+        # callback was the hot path's biggest fixed cost, and the normalized
+        # text is only read at flow-build/serialization time.
+        code_str = self._code_str
+        if code_str is None:
+            code_str = self.raw_code_str
+            try:
+                code_str = black.format_str(code_str, mode=black.FileMode()).strip()
+            except black.InvalidInput:
+                pass
+            self._code_str = code_str
+        return code_str
+
     def to_dict(self):
         return {**super().to_dict(), "frame_id": str(self.frame_id)}
 
@@ -87,6 +208,21 @@ class Line(Computation):
 class Call(Computation):
     """Class that represents a call site."""
 
+    event_type = "call"
+
+    __slots__ = (
+        "callsite_ast",
+        "source_location",
+        "arg_values",
+        "func_name",
+        "vars",
+        "frame_id",
+        "callee_frame_id",
+        "_code_str",
+        "vars_before_return",
+        "surrounding",
+    )
+
     def __init__(
         self,
         *,
@@ -95,7 +231,6 @@ class Call(Computation):
         arg_values: inspect.ArgInfo,
         func_name: str,
         vars: Vars,
-        event_type: str,
         frame_id: FrameID,
         callee_frame_id: FrameID,
         surrounding: Surrounding,
@@ -105,13 +240,22 @@ class Call(Computation):
         self.arg_values = arg_values
         self.func_name = func_name
         self.vars = vars
-        self.event_type = event_type
         self.frame_id = frame_id
         self.callee_frame_id = callee_frame_id
-        self.code_str = utils.ast_to_str(self.callsite_ast)
+        self._code_str = None
         self.vars_before_return = None
         self.surrounding = surrounding
 
+    @property
+    def code_str(self):
+        # Formatted lazily: ast_to_str runs astor + black, and most Calls are
+        # recorded during capture but only serialized (if ever) after tracing
+        # ends. Computed at most once per instance.
+        code_str = self._code_str
+        if code_str is None:
+            code_str = self._code_str = utils.ast_to_str(self.callsite_ast)
+        return code_str
+
     def to_dict(self):
         return {
             **super().to_dict(),
@@ -121,23 +265,29 @@ class Call(Computation):
 
     @staticmethod
     def create(frame):
+        # Binds the frame/code chain once; every f_back/f_code read goes
+        # through a C-level descriptor and this runs on every call event.
         caller_frame = frame.f_back
+        caller_code = caller_frame.f_code
+        # A call site inside excluded code (e.g. user code invoked as a stdlib
+        # callback) is of no interest; bail before tokenizing the caller's
+        # source and snapshotting its locals. should_exclude is lru_cached, so
+        # this costs one dict hit per event.
+        if utils.should_exclude(caller_code.co_filename):
+            return None
         _, surrounding = utils.get_code_str_and_surrounding(caller_frame)
-        callsite_ast = executing.Source.executing(caller_frame).node
+        callsite_ast = _get_callsite_ast(caller_frame)
         # If it's not ast.Call, like ast.ListComp, ignore for now.
         if not isinstance(callsite_ast, ast.Call):
             return None
         frame_id = FrameID.create("call")
-        frame_id.co_name = caller_frame.f_code.co_name
+        frame_id.co_name = caller_code.co_name
         return Call(
             callsite_ast=callsite_ast,
-            source_location=SourceLocation(
-                filepath=caller_frame.f_code.co_filename, surrounding=surrounding
-            ),
-            arg_values=inspect.getargvalues(frame),
+            source_location=_intern_source_location(caller_code, surrounding),
+            arg_values=utils.get_argvalues(frame),
             func_name=frame.f_code.co_name,
             vars=Vars(caller_frame),
-            event_type="call",
             frame_id=frame_id,
             callee_frame_id=FrameID.current(),
             surrounding=surrounding,
@@ -145,76 +295,131 @@ class Call(Computation):
 
 
 class ComputationManager:
-    """Class that stores and manages all computations."""
+    """Class that stores and manages all computations.
+
+    Computations are recorded synchronously, on the tracer's thread. This is
+    deliberate: the tracer decides whether to keep tracing a frame based on
+    add_computation's return value, and the duplicate-logical-line check reads
+    the most recent computation of the same frame, so events must be fully
+    processed in order before the next one arrives. Handing events to a
+    background queue would break both without removing the expensive part of
+    the work (the Vars snapshot), which has to happen before the frame mutates.
+    """
 
     REGISTER_CALL = "cyberbrain.register"
 
     def __init__(self):
-        self.frame_groups: Dict[FrameID, List[Union[Line, Call]]] = defaultdict(list)
+        # Per-frame groups are deques: keeping the current Line at the tail
+        # while inserting Calls before it is a pop + two appends, where a
+        # list's insert(len - 1, ...) shifts elements on every call event.
+        self.frame_groups: Dict[FrameID, Deque[Union[Line, Call]]] = defaultdict(deque)
         self.target = None
+        # Frame id and surrounding of the last recorded line. Consecutive
+        # events from the same logical line (the typical multiline case) hit
+        # these two attribute reads instead of the frame_groups lookup chain.
+        self._last_line_frame_id = None
+        self._last_line_surrounding = None
 
     def add_computation(self, event_type, frame, arg) -> bool:
         """Adds a computation to manager.
 
         Returns Whether a new computation has been created and added.
         """
-        assert event_type in {"line", "call", "return"}
-        if event_type == "line":
-            code_str, surrounding = utils.get_code_str_and_surrounding(frame)
-            frame_id = FrameID.create(event_type)
-            frame_id.co_name = frame.f_code.co_name
-            # Skips if the same logical line has been added.
+        # Dict dispatch mirrors the tracer's handler table in api: one lookup
+        # replaces chained string comparisons on every event, and unknown
+        # event types fail loudly with a KeyError.
+        return self._HANDLERS[event_type](self, frame, arg)
+
+    # Handlers bind their hot module-level globals as default arguments: they
+    # run on every event, and the defaults turn global-dict (and method)
+    # lookups into local reads, same as the tracer functions in api.
+    def _on_line(
+        self,
+        frame,
+        arg,
+        _fid_create=FrameID.create,
+        _get_code_str=utils.get_code_str_and_surrounding,
+        _Line=Line,
+        _Vars=Vars,
+        _intern=sys.intern,
+    ) -> bool:
+        frame_id = _fid_create("line")
+        frame_id.co_name = frame.f_code.co_name
+        # Skips if the same logical line has been added. When the event stays
+        # inside the surrounding of the last recorded line of the same frame
+        # (each further physical line of a multiline statement), it can be
+        # rejected from f_lineno alone, before the tokenizer pass runs.
+        if frame_id == self._last_line_frame_id:
+            last_surrounding = self._last_line_surrounding
             if (
-                self.frame_groups[frame_id]
-                and self.frame_groups[frame_id][-1].surrounding == surrounding
+                last_surrounding.start_lineno
+                <= frame.f_lineno
+                <= last_surrounding.end_lineno
             ):
                 return False
-            comp = Line(
-                code_str=code_str.rsplit("#", 1)[0].strip(),  # Removes comment.
-                source_location=SourceLocation(
-                    filepath=frame.f_code.co_filename, surrounding=surrounding
-                ),
-                vars=Vars(frame),
-                event_type=event_type,
-                frame_id=frame_id,
-                surrounding=surrounding,
-            )
-            if comp.code_str.startswith(self.REGISTER_CALL):
-                self.target = comp
-            self.frame_groups[frame_id].append(comp)
-            return True
-
-        if event_type == "call":
-            # In Python 3.8, for multiline statement, after the events triggered by each
-            # line, there will be an extra line event triggered by the first line. This
-            # will cause the lineno for call comp to be different in different Python
-            # verions.
-            computation = Call.create(frame)
-            # Don't trace cyberbrain.register.
-            if not computation or computation.code_str.startswith(self.REGISTER_CALL):
+        code_str, surrounding = _get_code_str(frame)
+        # The per-frame check still covers lines revisited after an
+        # intervening nested call. The tokenizer cache returns one Surrounding
+        # instance per logical line, so repeats hit the pointer compare and
+        # the namedtuple field-by-field __eq__ only runs as a safety net.
+        group = self.frame_groups[frame_id]
+        if group:
+            prev_surrounding = group[-1].surrounding
+            if prev_surrounding is surrounding or prev_surrounding == surrounding:
                 return False
-            frame_id = computation.frame_id
-            # When entering a new call, replaces previous line(aka caller) with a
-            # call computation.
-            if (
-                self.frame_groups[frame_id]
-                and self.frame_groups[frame_id][-1].event_type == "line"
-            ):
-                # Always keeps Line computation at the end.
-                self.frame_groups[frame_id].insert(
-                    len(self.frame_groups[frame_id]) - 1, computation
-                )
-            else:
-                self.frame_groups[frame_id].append(computation)
+        comp = _Line(
+            # Comments are already removed at the token level by
+            # get_code_str_and_surrounding.
+            code_str=_intern(code_str),
+            source_location=_intern_source_location(frame.f_code, surrounding),
+            vars=_Vars(frame),
+            frame_id=frame_id,
+            surrounding=surrounding,
+        )
+        # Checked against the raw text so the lazy black formatting isn't
+        # forced here; formatting doesn't change this prefix anyway.
+        if comp.raw_code_str.startswith(self.REGISTER_CALL):
+            self.target = comp
+        self.frame_groups[frame_id].append(comp)
+        self._last_line_frame_id = frame_id
+        self._last_line_surrounding = surrounding
+        return True
 
-            return True
+    def _on_call(
+        self, frame, arg, _call_create=Call.create, _is_register=_is_register_call
+    ) -> bool:
+        # In Python 3.8, for multiline statement, after the events triggered by each
+        # line, there will be an extra line event triggered by the first line. This
+        # will cause the lineno for call comp to be different in different Python
+        # verions.
+        computation = _call_create(frame)
+        # Don't trace cyberbrain.register.
+        if not computation or _is_register(computation.callsite_ast):
+            return False
+        frame_id = computation.frame_id
+        # When entering a new call, replaces previous line(aka caller) with a
+        # call computation.
+        group = self.frame_groups[frame_id]
+        if group and group[-1].event_type == "line":
+            # Always keeps Line computation at the end.
+            line = group.pop()
+            group.append(computation)
+            group.append(line)
+        else:
+            group.append(computation)
 
-        # event is "return".
-        frame_id = FrameID.create(event_type)
+        return True
+
+    def _on_return(
+        self, frame, arg, _fid_create=FrameID.create, _Vars=Vars
+    ) -> bool:
+        frame_id = _fid_create("return")
         assert self.frame_groups[frame_id][-1].event_type == "line"
         self.frame_groups[frame_id][-1].return_value = arg
-        self.frame_groups[frame_id][-1].vars_before_return = Vars(frame)
+        self.frame_groups[frame_id][-1].vars_before_return = _Vars(frame)
         return True
 
+    _HANDLERS = {"line": _on_line, "call": _on_call, "return": _on_return}
+
 
 computation_manager = ComputationManager()
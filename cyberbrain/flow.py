@@ -1,6 +1,7 @@
 """Execution flow that represents a program's execution."""
 
 import ast
+import copy
 import inspect
 import itertools
 import re
@@ -15,6 +16,13 @@ from .basis import ID, FrameID, NodeType, SourceLocation, _dummy
 from .computation import ComputationManager
 
 
+# Matches "cyberbrain.register(x)" where x is a single identifier, which is the
+# only form register() is documented to take.
+_REGISTER_CALL_RE = re.compile(
+    r"\s*cyberbrain\s*\.\s*register\s*\(\s*([A-Za-z_]\w*)\s*\)\s*$"
+)
+
+
 @dataclass()
 class VarAppearance:
     """Variable appears in current frame."""
@@ -72,15 +80,31 @@ class TrackingMetadata:
         self.return_value = _dummy
         self.is_relevant_return = False
 
+        # Lazily computed by get_names. Not filled eagerly because code_ast can
+        # still be rewritten by replace_calls before tracing starts.
+        self._names = None
+
+    def get_names(self) -> Set[ID]:
+        """Returns identifiers appearing in this node's code, computed once.
+
+        Backtracing asks for a node's names repeatedly (loops revisit the same
+        node, and callsite handling needs them more than once); walking the AST
+        every time was pure repeated work.
+        """
+        if self._names is None:
+            self._names = utils.find_names(self.code_ast)
+        return self._names
+
     def set_param_arg_mapping(self, arg_values: inspect.ArgInfo):
         param_to_arg = callsite.get_param_to_arg(
             self.code_ast.body[0].value, arg_values
         )
         self.param_to_arg = param_to_arg
-        self.arg_to_param = {}
-        for param, args in param_to_arg.items():
-            for arg in args:
-                self.arg_to_param[arg] = param
+        # Inverted once here; trace_flow then resolves arg -> param with a
+        # single dict lookup per var change.
+        self.arg_to_param = {
+            arg: param for param, args in param_to_arg.items() for arg in args
+        }
 
     def get_args(self) -> Set[ID]:
         # pytype: disable=bad-return-type
@@ -97,7 +121,9 @@ class TrackingMetadata:
         self.var_switches.extend(var_switches)
 
     def sync_tracking_with(self, other: "Node"):
-        self.add_tracking(*other.tracking)
+        # One C-level set intersection + union instead of a Python loop with a
+        # membership test per identifier.
+        self.tracking |= other.tracking & self.vars.keys()
 
     def add_tracking(self, *new_ids: ID):
         """Updates identifiers being tracked.
@@ -105,11 +131,7 @@ class TrackingMetadata:
         Identifiers being tracked must exist in data because we can't track something
         that don't exist in previous nodes.
         """
-        for new_id in new_ids:
-            if new_id == "self":
-                breakpoint()
-            if new_id in self.vars:
-                self.tracking.add(new_id)
+        self.tracking.update(new_id for new_id in new_ids if new_id in self.vars)
 
 
 class Node:
@@ -193,9 +215,12 @@ class Node:
         Current and next must live in the same frame.
         """
         assert self.frame_id == other.frame_id
+        self_vars, other_vars = self.vars, other.vars
         for var_id in other.tracking:
-            old_value = self.vars.get(var_id, _dummy)
-            new_value = other.vars[var_id]
+            old_value = self_vars.get(var_id, _dummy)
+            new_value = other_vars[var_id]
+            # has_diff's identity/equality fast path acts as the cheap
+            # prefilter here; unchanged values never reach DeepDiff.
             if old_value is _dummy:
                 var_appearance = VarAppearance(id=var_id, value=new_value)
                 self.add_var_appearances(var_appearance)
@@ -237,6 +262,13 @@ class Flow:
 
     def _update_target_id(self):
         """Gets ID('x') out of cyberbrain.register(x)."""
+        # The register call has a fixed shape, so a regex match is enough and
+        # much cheaper than building an AST just to pluck one identifier out.
+        match = _REGISTER_CALL_RE.match(self.target.code_str)
+        if match:
+            self.target.add_tracking(ID(match.group(1)))
+            return
+        # Falls back to parsing for anything the regex doesn't recognize.
         register_call_ast = ast.parse(self.target.code_str.strip())
         assert register_call_ast.body[0].value.func.value.id == "cyberbrain"
 
@@ -306,7 +338,8 @@ def build_flow(cm: ComputationManager) -> Flow:
     replace_calls(frame_groups)
 
     # Assuming init is called at program start. This may change in the future.
-    start_node = frame_groups[(0,)][0].node
+    # FrameID no longer hashes like its tuple, so the key must be a FrameID.
+    start_node = frame_groups[FrameID((0,))][0].node
 
     return Flow(start_node, target_node)
 
@@ -376,5 +409,8 @@ def replace_calls(frame_groups: Dict[FrameID, List[NodeInfo]]):
                 prev.next = node.next
                 if node.next:
                     node.next.prev = prev
+                # parse_code_str memoizes ASTs, so mutate a copy, not the
+                # shared instance.
+                prev.code_ast = copy.deepcopy(prev.code_ast)
                 prev.code_ast.body[0].targets = stmt.targets
                 prev.code_str = astor.to_source(prev.code_ast).strip()
@@ -5,16 +5,17 @@ import dis
 import inspect
 import io
 import itertools
+import re
 import sysconfig
 import token
 import tokenize
 import typing
 from functools import lru_cache
-from typing import List, Tuple
+from types import CodeType
+from typing import Dict, List, Tuple
 
 import astor
 import black
-import deepdiff
 
 from .basis import ID, Surrounding
 
@@ -25,6 +26,24 @@ except ImportError:
 
 _INSTALLATION_PATHS = list(sysconfig.get_paths().values())
 
+# One regex that matches any excluded filename: installation-path prefixes,
+# plus frozen modules and some weird cases anywhere in the name. Compiled once
+# so each check is a single C-level scan instead of a Python loop over paths.
+_EXCLUDED_FILENAME_RE = re.compile(
+    "|".join(
+        ["^" + re.escape(path) for path in _INSTALLATION_PATHS]
+        + [
+            re.escape(name)
+            for name in (
+                "importlib._boostrap",
+                "importlib._bootstrap_external",
+                "zipimport",
+                "<string>",  # Dynamically generated frames, like
+            )
+        ]
+    )
+)
+
 
 @lru_cache()
 def should_exclude(filename):
@@ -37,18 +56,38 @@ def should_exclude(filename):
 
     Also we exclude frozen modules, as well as some weird cases.
     """
-    if any(filename.startswith(path) for path in _INSTALLATION_PATHS) or any(
-        name in filename
-        for name in (
-            "importlib._boostrap",
-            "importlib._bootstrap_external",
-            "zipimport",
-            "<string>",  # Dynamically generated frames, like
-        )
-    ):
-        return True
+    return _EXCLUDED_FILENAME_RE.search(filename) is not None
+
+
+# Maps code object -> (args, varargs, varkw). A function's signature shape
+# never changes, so it's computed once per code object; only f_locals is live
+# per call. Keyed by the code object itself rather than id(code) so the entry
+# pins its code object and can't be served to a recycled id. The args tuple is
+# shared between ArgInfos and must not be mutated.
+_signature_shapes: Dict[CodeType, Tuple] = {}
 
-    return False
+
+def get_argvalues(frame) -> inspect.ArgInfo:
+    """Builds ArgInfo for a frame by slicing co_varnames directly.
+
+    Equivalent to inspect.getargvalues, minus its generic code-object parsing:
+    argument names always sit at the front of co_varnames, with *args/**kwargs
+    right after them when the corresponding co_flags bits are set.
+    """
+    code = frame.f_code
+    shape = _signature_shapes.get(code)
+    if shape is None:
+        varnames = code.co_varnames
+        nargs = code.co_argcount + code.co_kwonlyargcount
+        args = varnames[:nargs]
+        varargs = varkw = None
+        if code.co_flags & inspect.CO_VARARGS:
+            varargs = varnames[nargs]
+            nargs += 1
+        if code.co_flags & inspect.CO_VARKEYWORDS:
+            varkw = varnames[nargs]
+        shape = _signature_shapes[code] = (args, varargs, varkw)
+    return inspect.ArgInfo(*shape, frame.f_locals)
 
 
 def grouped(iterable, n):
@@ -106,6 +145,12 @@ def _get_module_token_groups(frame) -> List[List[tokenize.TokenInfo]]:
     return groups
 
 
+# Maps id(token group) -> (code_str, Surrounding). Token groups live in
+# _tokens_cache for the whole session, so ids are stable and the untokenize
+# pass runs once per logical line instead of once per line event.
+_code_str_cache: Dict[int, Tuple[str, Surrounding]] = {}
+
+
 def get_code_str_and_surrounding(frame) -> Tuple[str, Surrounding]:
     """Gets code string and surrounding information for line event.
 
@@ -115,6 +160,10 @@ def get_code_str_and_surrounding(frame) -> Tuple[str, Surrounding]:
     by checking their (frame_id, surrounding).
 
     Both lineno and surrounding are 1-based, aka the smallest lineno is 1.
+
+    The returned code string has comments removed at the token level (a text
+    split on "#" would break on "#" inside string literals) and is stripped.
+    Results are memoized per logical line.
     """
     lineno = _get_lineno(frame)
     groups: List[List[tokenize.TokenInfo]] = _get_module_token_groups(frame)
@@ -134,44 +183,69 @@ def get_code_str_and_surrounding(frame) -> Tuple[str, Surrounding]:
         # Reachs end of groups
         group = next_group
 
-    # Removes leading NL and DEDENT as they cause untokenize to fail.
+    cached = _code_str_cache.get(id(group))
+    if cached is not None:
+        return cached
+
+    key = id(group)
+    # Drops comment tokens, plus leading NL and DEDENT as they cause
+    # untokenize to fail. Works on a copy so the cache key's group survives.
+    group = [tok for tok in group if tok.type != tokenize.COMMENT]
     while group[0].type in {token_NL, token.DEDENT, token.INDENT}:
         group.pop(0)
     # When untokenizing, Python adds \\\n for absent lines(because lineno in
     # group doesn't start from 1), removes them.
     # Note that since we've removed the leading ENCODING token, untokenize will return
     # a str instead of encoded bytes.
-    return (
-        tokenize.untokenize(group).lstrip("\\\n"),
+    result = _code_str_cache[key] = (
+        tokenize.untokenize(group).lstrip("\\\n").strip(),
         Surrounding(start_lineno=group[0].start[0], end_lineno=group[-1].end[0]),
     )
+    return result
 
 
-class _NameVisitor(ast.NodeVisitor):
-    def __init__(self):
-        self.names: typing.Set[ID] = set()
-        super().__init__()
+def find_names(code_ast: ast.AST) -> typing.Set[ID]:
+    """Finds idenditifiers in given ast node.
 
-    def visit_Name(self, node):
-        self.names.add(node.id)
-        self.generic_visit(node)
+    A flat ast.walk loop beats a NodeVisitor here: the visitor resolves a
+    visit_* method per node, while this is one generator step plus a class
+    identity check. ast.Name has no subclasses in practice, so the identity
+    check safely replaces isinstance.
+    """
+    return {
+        ID(node.id) for node in ast.walk(code_ast) if node.__class__ is ast.Name
+    }
 
 
-def find_names(code_ast: ast.AST) -> typing.Set[ID]:
-    """Finds idenditifiers in given ast node."""
-    visitor = _NameVisitor()
-    visitor.visit(code_ast)
-    return {ID(name) for name in visitor.names}
+def has_diff(x, y):
+    """Returns whether x and y differ.
 
+    DeepDiff walks the whole object graph, which is wasted work for the
+    dominant case where a variable didn't change between adjacent events.
+    Identity and __eq__ answer that cheaply; DeepDiff remains the fallback for
+    values whose __eq__ is broken or ambiguous.
+    """
+    if x is y:
+        return False
+    try:
+        return bool(x != y)
+    except Exception:  # pylint: disable=broad-except
+        # Deferred import: DeepDiff is only needed for values whose __eq__
+        # raises, so the average run never pays for loading it.
+        import deepdiff  # pylint: disable=import-outside-toplevel
 
-def has_diff(x, y):
-    return deepdiff.DeepDiff(x, y) != {}
+        return deepdiff.DeepDiff(x, y) != {}
 
 
+@lru_cache(maxsize=None)
 def parse_code_str(code_str) -> ast.AST:
     """Parses code string in a computation, which can be incomplete.
 
     Once we found something that leads to error while parsing, we should handle it here.
+
+    Results are memoized: the same logical line recurs once per loop iteration in
+    traced programs, and rebuilding its AST each time dominated flow building.
+    Callers therefore must not mutate the returned AST — copy it first.
     """
     if code_str.endswith(":"):
         code_str += "pass"
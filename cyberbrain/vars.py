@@ -3,33 +3,87 @@
 import copy
 import inspect
 import itertools
-from collections import UserDict
 
+# Values of these types can't change, so storing them as-is is always safe.
+_ATOMIC_TYPES = (int, float, complex, bool, str, bytes, type(None))
 
-class Vars(UserDict):  # pylint: disable=too-many-ancestors
-    """A class that holds variable values in a trace event."""
+# Containers we know how to copy cheaply without walking the object graph.
+_CONTAINER_TYPES = (list, tuple, set, frozenset, dict)
+
+# Sentinel for local names that exist in the code object but aren't bound yet.
+_unbound = object()
+
+
+def _snapshot(value):
+    """Copies value just deep enough that later mutation won't affect the copy.
+
+    copy.deepcopy walks the full object graph and maintains a memo dict, which
+    is overkill for the values that dominate real programs: atomic immutables
+    and flat containers of them. Those are fast-pathed here; everything else
+    falls back to the old deepcopy/copy/identity cascade.
+    """
+    if isinstance(value, _ATOMIC_TYPES):
+        return value
+    value_type = type(value)
+    if value_type in _CONTAINER_TYPES:
+        if value_type is dict:
+            items = itertools.chain(value.keys(), value.values())
+        else:
+            items = value
+        if all(isinstance(item, _ATOMIC_TYPES) for item in items):
+            # Tuples of immutables are themselves immutable.
+            return value if value_type is tuple else value.copy()
+    try:
+        return copy.deepcopy(value)
+    except TypeError:
+        try:
+            return copy.copy(value)
+        except TypeError:
+            return value
+
+
+class Vars(dict):
+    """A class that holds variable values in a trace event.
+
+    Subclasses dict directly rather than UserDict: lookups and stores happen
+    once per variable per event, and UserDict routes every one of them through
+    a Python-level method and a wrapped .data dict. Inheriting dict keeps all
+    accesses at C speed with no wrapper object.
+    """
 
     def __init__(self, frame):
         super().__init__()
         self._scan_namespaces(frame)
-        del frame
-
-    def __getitem__(self, name):
-        return self.data[name]
 
     def _scan_namespaces(self, frame):
-        """Records variables from bottom to top."""
-        for name, value in itertools.chain.from_iterable(
-            [frame.f_locals.items(), frame.f_globals.items()]
+        """Records variables from bottom to top.
+
+        Only this frame's f_locals and f_globals are read. We never walk
+        frame.f_back: enclosing frames' locals only change when control returns
+        to them, and the tracer fires a separate event there, so each frame's
+        snapshot is taken exactly where it's cheap — O(locals in current frame)
+        per event instead of O(stack depth × locals).
+
+        Local names are read off the code object's name tuples instead of
+        iterating f_locals: co_varnames/co_cellvars/co_freevars are fixed at
+        compile time, so this skips materializing an items() view and, at
+        module level (where f_locals is f_globals), avoids scanning the same
+        namespace twice.
+        """
+        code = frame.f_code
+        f_locals = frame.f_locals
+        for name in itertools.chain(
+            code.co_varnames, code.co_cellvars, code.co_freevars
         ):
+            value = f_locals.get(name, _unbound)
+            # Not-yet-bound locals don't appear in f_locals.
+            if value is _unbound:
+                continue
             # TODO: exclude other stuff we don't need.
             if inspect.ismodule(value) or inspect.isbuiltin(value):
                 continue
-            # Tries copy as deep as possible so that changes won't affect stored value.
-            try:
-                self.data[name] = copy.deepcopy(value)
-            except TypeError:
-                try:
-                    self.data[name] = copy.copy(value)
-                except TypeError:
-                    self.data[name] = value
+            self[name] = _snapshot(value)
+        for name, value in frame.f_globals.items():
+            if inspect.ismodule(value) or inspect.isbuiltin(value):
+                continue
+            self[name] = _snapshot(value)